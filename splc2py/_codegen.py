@@ -0,0 +1,151 @@
+import math
+import keyword
+import logging
+from collections import Counter
+
+from splc2py._logs import CONSTANT_OPTIONS
+
+
+def _order_terms(model):
+    """
+    Sorts the options of every term by how many terms use them, so that terms
+    sharing options also share the prefixes of their products.
+    """
+    frequency = Counter()
+    first_seen = {}
+    for term in model:
+        for option in term["options"]:
+            if option in CONSTANT_OPTIONS:
+                continue
+            frequency[option] += 1
+            first_seen.setdefault(option, len(first_seen))
+
+    features = sorted(frequency, key=lambda o: (-frequency[o], first_seen[o]))
+    rank = {option: i for i, option in enumerate(features)}
+    ordered = [
+        (
+            term["coefficient"],
+            tuple(
+                sorted(
+                    (o for o in term["options"] if o not in CONSTANT_OPTIONS),
+                    key=rank.get,
+                )
+            ),
+        )
+        for term in model
+    ]
+    return features, ordered
+
+
+def _build_products(ordered, index):
+    """
+    Assigns every distinct prefix of the ordered terms a product node.
+    Returns the multiplications as (name, left, right) in evaluation order and
+    the node of each term (None for constant terms).
+    """
+    nodes = {(option,): name for option, name in index.items()}
+    steps = []
+    term_nodes = []
+    for _, options in ordered:
+        prefix = ()
+        for option in options:
+            parent = prefix
+            prefix = prefix + (option,)
+            if prefix not in nodes:
+                nodes[prefix] = f"p{len(steps)}"
+                steps.append((nodes[prefix], nodes[parent], index[option]))
+        term_nodes.append(nodes.get(prefix))
+    return steps, term_nodes
+
+
+def _check_inputs(model, function_name):
+    if not function_name.isidentifier() or keyword.iskeyword(function_name):
+        logging.error("%s is not a valid function name.", function_name)
+        raise ValueError(f"Invalid function name {function_name!r}.")
+    if not all(math.isfinite(term["coefficient"]) for term in model):
+        logging.error("Models with non-finite coefficients can not be exported.")
+        raise ValueError("Non-finite coefficient in model.")
+
+
+def _generate(model, load, multiply, add):
+    features, ordered = _order_terms(model)
+    index = {option: f"v{i}" for i, option in enumerate(features)}
+    steps, term_nodes = _build_products(ordered, index)
+
+    lines = [load(name, i, option) for i, (option, name) in enumerate(index.items())]
+    lines += [multiply(name, left, right) for name, left, right in steps]
+
+    constant = sum(
+        coefficient
+        for (coefficient, _), node in zip(ordered, term_nodes)
+        if node is None
+    )
+    summands = [repr(float(constant))] + [
+        f"{coefficient!r} * {node}"
+        for (coefficient, _), node in zip(ordered, term_nodes)
+        if node is not None
+    ]
+    return features, lines, add(summands)
+
+
+def generate_python(model, function_name: str = "predict") -> str:
+    """
+    Generates python source of a function that predicts a single configuration
+    given as a mapping from option names to values. Since only element-wise
+    multiplication and addition are used, the function also works on mappings
+    of numpy arrays or pandas columns.
+    """
+
+    _check_inputs(model, function_name)
+
+    def load(name, _, option):
+        return f"    {name} = x[{option!r}]"
+
+    def multiply(name, left, right):
+        return f"    {name} = {left} * {right}"
+
+    def add(summands):
+        terms = "".join(f"        + {summand}\n" for summand in summands)
+        return "    return (\n" + terms + "    )"
+
+    _, lines, result = _generate(model, load, multiply, add)
+    return "\n".join([f"def {function_name}(x):"] + lines + [result]) + "\n"
+
+
+def generate_c(model, function_name: str = "predict") -> str:
+    """
+    Generates C source of a function that predicts a single configuration given
+    as an array of option values. The expected order of the options is listed
+    in the comment above the function.
+    """
+    _check_inputs(model, function_name)
+    for term in model:
+        for option in term["options"]:
+            if "*/" in option or "\n" in option or "\r" in option:
+                logging.error("%r can not be listed in a C comment.", option)
+                raise ValueError(f"Invalid option name {option!r}.")
+
+    def load(name, position, _):
+        return f"    const double {name} = x[{position}];"
+
+    def multiply(name, left, right):
+        return f"    const double {name} = {left} * {right};"
+
+    def add(summands):
+        return "    return " + "\n        + ".join(summands) + ";"
+
+    features, lines, result = _generate(model, load, multiply, add)
+    header = [
+        "/* options: "
+        + ", ".join(f"x[{i}] = {option}" for i, option in enumerate(features))
+        + " */",
+        f"double {function_name}(const double *x)",
+    ]
+    return "\n".join(header + ["{"] + lines + [result, "}"]) + "\n"
+
+
+def compile_python(model, function_name: str = "predict"):
+    namespace = {}
+    source = generate_python(model, function_name)
+    exec(compile(source, "<splc2py>", "exec"), namespace)
+    return namespace[function_name]
@@ -1,5 +1,8 @@
 import os
 
+# Options in SPLC models that are always enabled and contribute no factor.
+CONSTANT_OPTIONS = ("root",)
+
 
 def _extract_options(config: str):
     config = config.split('"')[1].split("%;%")
@@ -0,0 +1,302 @@
+import os
+import sys
+import math
+import mmap
+import array
+import struct
+import logging
+import tempfile
+
+# File layout (all values little-endian):
+#   header          see _HEADER
+#   coefficients    float64[n_terms]
+#   xtx             float64[n_terms * (n_terms + 1) / 2], upper triangle of the
+#                   normal equations row by row (only if n_samples > 0)
+#   xty             float64[n_terms] (only if n_samples > 0)
+#   term_offsets    uint32[n_terms + 1], slices into option_indices
+#   option_indices  uint32[n_refs], indices into the feature names
+#   binary_flags    uint32[n_features], 1 for binary options
+#   string_lengths  uint32[n_strings]
+#   strings         utf-8, concatenated in the order
+#                   features, history columns, history values (column by
+#                   column), configs_large_dev, nfp, artifact_repo
+MAGIC = b"SPLC2PY\x00"
+VERSION = 1
+# magic, version, n_features, n_terms, n_refs, history rows, history columns,
+# n_samples, flags, learning_time
+_HEADER = struct.Struct("<8sIIIIIIIId")
+_HAS_HISTORY = 1
+
+
+class CompactModel:
+    """
+    Read-only view on a model stored in the compact binary format.
+    ...
+
+    Only the header and the feature names are decoded when loading, the terms
+    are evaluated directly on the (memory-mapped) arrays and the learning
+    history is decoded on first access.
+
+    Attributes
+    ----------
+    coefficients : memoryview
+        float64 coefficients of all terms, backed by the mapped file if possible.
+    term_offsets : memoryview
+        term i uses option_indices[term_offsets[i]:term_offsets[i + 1]].
+    option_indices : memoryview
+        indices into features for the options of all terms.
+    features : list
+        names of all options referenced by the model.
+    binary : list
+        names of the binary options, None if the model has none or they were
+        not known when saving.
+    learning_time : float
+        time SPLC needed for learning in seconds, None if not known.
+    normal_equations : tuple
+        packed upper triangle of XᵀX, Xᵀy and the number of measurements
+        they were accumulated from, None if not stored.
+    nfp : str
+        name of the non-functional property the model predicts.
+    artifact_repo : str
+        directory with the learning artifacts of the fit.
+
+    Methods
+    -------
+    evaluate(x):
+        Predicts a single configuration given as a mapping of option values.
+    terms():
+        Returns the terms in the format used by Model.model.
+    history_rows():
+        Returns the learning history in the format used by Model.learn_history.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        (
+            magic,
+            version,
+            n_features,
+            n_terms,
+            n_refs,
+            self._n_rows,
+            self._n_cols,
+            n_samples,
+            flags,
+            learning_time,
+        ) = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            logging.error("The provided file is not a splc2py model.")
+            raise ValueError("Invalid model file.")
+        if version != VERSION:
+            logging.error("Unsupported model format version %s.", version)
+            raise ValueError(f"Unsupported model format version {version}.")
+        self.learning_time = None if math.isnan(learning_time) else learning_time
+
+        offset = _HEADER.size
+        self.coefficients, offset = _read_array(view, offset, "d", n_terms)
+        self.normal_equations = None
+        if n_samples:
+            n_packed = n_terms * (n_terms + 1) // 2
+            xtx, offset = _read_array(view, offset, "d", n_packed)
+            xty, offset = _read_array(view, offset, "d", n_terms)
+            self.normal_equations = (xtx, xty, n_samples)
+        self.term_offsets, offset = _read_array(view, offset, "I", n_terms + 1)
+        self.option_indices, offset = _read_array(view, offset, "I", n_refs)
+        binary_flags, offset = _read_array(view, offset, "I", n_features)
+
+        n_strings = n_features + self._n_cols + self._n_cols * self._n_rows + 3
+        self._lengths, self._strings_offset = _read_array(view, offset, "I", n_strings)
+        self.features = self._decode_strings(0, n_features)
+        self.binary = [
+            feature for feature, flag in zip(self.features, binary_flags) if flag
+        ] or None
+        nfp, artifact_repo = self._decode_strings(n_strings - 2, 2)
+        self.nfp = nfp or None
+        self.artifact_repo = artifact_repo or None
+        self._has_history = bool(flags & _HAS_HISTORY)
+        self._learn_history = None
+        self._configs_large_dev = None
+
+    def _decode_strings(self, first, count):
+        view = memoryview(self._buffer)
+        offset = self._strings_offset + sum(self._lengths[:first])
+        strings = []
+        for length in self._lengths[first : first + count]:
+            strings.append(str(view[offset : offset + length], "utf-8"))
+            offset += length
+        return strings
+
+    def _decode_history(self):
+        n_features = len(self.features)
+        n_cols, n_rows = self._n_cols, self._n_rows
+        strings = self._decode_strings(n_features, n_cols + n_cols * n_rows + 1)
+        columns = strings[:n_cols]
+        values = strings[n_cols:-1]
+        self._learn_history = {
+            column: values[i * n_rows : (i + 1) * n_rows]
+            for i, column in enumerate(columns)
+        }
+        self._configs_large_dev = strings[-1] or None
+
+    @property
+    def learn_history(self):
+        """
+        Learning history with one list of values per column, None if the
+        model has no history.
+        """
+        if not self._has_history:
+            return None
+        if self._learn_history is None:
+            self._decode_history()
+        return self._learn_history
+
+    @property
+    def configs_large_dev(self):
+        """
+        Configurations with too large deviation as reported by SPLC.
+        """
+        if self._configs_large_dev is None:
+            self._decode_history()
+        return self._configs_large_dev
+
+    def evaluate(self, x):
+        offsets = self.term_offsets
+        indices = self.option_indices
+        values = [x[feature] for feature in self.features]
+        prediction = 0.0
+        for i, coefficient in enumerate(self.coefficients):
+            for j in indices[offsets[i] : offsets[i + 1]]:
+                coefficient *= values[j]
+            prediction += coefficient
+        return prediction
+
+    def terms(self):
+        offsets = self.term_offsets
+        return [
+            {
+                "coefficient": self.coefficients[i],
+                "options": [
+                    self.features[j]
+                    for j in self.option_indices[offsets[i] : offsets[i + 1]]
+                ],
+            }
+            for i in range(len(self.coefficients))
+        ]
+
+    def history_rows(self):
+        if self.learn_history is None:
+            return None
+        columns = list(self.learn_history.keys())
+        n_rows = len(self.learn_history[columns[0]]) if columns else 0
+        return [
+            {column: self.learn_history[column][i] for column in columns}
+            for i in range(n_rows)
+        ]
+
+
+def _read_array(view, offset, typecode, count):
+    size = array.array(typecode).itemsize * count
+    data = view[offset : offset + size]
+    if sys.byteorder == "little":
+        data = data.cast(typecode)
+    else:
+        data = array.array(typecode, data)
+        data.byteswap()
+    return data, offset + size
+
+
+def _to_bytes(typecode, values):
+    data = array.array(typecode, values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _history_columns(history):
+    columns = []
+    for row in history:
+        columns += [column for column in row if column not in columns]
+    return columns
+
+
+def dump(
+    path: str,
+    model,
+    learn_history,
+    learning_time,
+    configs_large_dev,
+    binary=None,
+    nfp=None,
+    artifact_repo=None,
+    normal_equations=None,
+):
+    """
+    Writes a model to path. normal_equations is given as returned by
+    CompactModel.normal_equations.
+    """
+    flags = _HAS_HISTORY if learn_history is not None else 0
+    learn_history = learn_history or []
+    positions = {}
+    offsets = [0]
+    indices = []
+    for term in model:
+        for option in term["options"]:
+            indices.append(positions.setdefault(option, len(positions)))
+        offsets.append(len(indices))
+    features = list(positions)
+
+    binary_flags = [int(option in (binary or ())) for option in features]
+
+    columns = _history_columns(learn_history)
+    strings = features + columns
+    for column in columns:
+        strings += [row.get(column, "") for row in learn_history]
+    strings += [configs_large_dev or "", nfp or "", artifact_repo or ""]
+    encoded = [s.encode("utf-8") for s in strings]
+
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        len(features),
+        len(model),
+        len(indices),
+        len(learn_history),
+        len(columns),
+        normal_equations[2] if normal_equations else 0,
+        flags,
+        learning_time if learning_time is not None else float("nan"),
+    )
+    sections = [header, _to_bytes("d", [term["coefficient"] for term in model])]
+    if normal_equations:
+        sections.append(_to_bytes("d", normal_equations[0]))
+        sections.append(_to_bytes("d", normal_equations[1]))
+    sections += [
+        _to_bytes("I", offsets),
+        _to_bytes("I", indices),
+        _to_bytes("I", binary_flags),
+        _to_bytes("I", [len(s) for s in encoded]),
+    ]
+    sections += encoded
+
+    # Write to a new file and replace path afterwards, since overwriting a file
+    # in place breaks processes that currently have it memory-mapped.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".splc2py-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.writelines(sections)
+        os.chmod(tmp_path, os.stat(path).st_mode if os.path.exists(path) else 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load(path: str, use_mmap: bool = True) -> CompactModel:
+    with open(path, "rb") as f:
+        if use_mmap:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = f.read()
+    return CompactModel(buffer)
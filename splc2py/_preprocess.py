@@ -40,16 +40,90 @@ def _pandas_to_splcxml(data, nfp, binary, numeric):
     return ET.ElementTree(root)
 
 
-def prepare_learning_data(data: pd.DataFrame(), nfp) -> ET:
-    features = data.drop(nfp, axis=1)
+def _split_options(features: pd.DataFrame):
     binary = features.columns[features.isin([0, 1]).all()]
     numeric = [col for col in features.columns if col not in binary]
+    return binary, numeric
+
+
+def prepare_learning_data(data: pd.DataFrame(), nfp) -> ET:
+    features = data.drop(nfp, axis=1)
+    binary, numeric = _split_options(features)
     measurements = _pandas_to_splcxml(data, nfp, binary, numeric)
     vm = _features_to_vm(binary, numeric, min(data.min()), max(data.max()))
 
     return vm, measurements
 
 
+def vm_options(vm: ET, kind: str):
+    return [
+        option.find("name").text
+        for option in vm.find(kind).findall("configurationOption")
+    ]
+
+
+def _splcxml_to_pandas(measurements: ET, nfp, binary, numeric):
+    rows = []
+    for r in measurements.getroot().iter("row"):
+        row = {option: 0 for option in binary}
+        for data in r.iter("data"):
+            text = data.text or ""
+            if data.get("column") == "Configuration":
+                row.update({option: 1 for option in text.split(",") if option})
+            elif data.get("column") == "Variable Features":
+                for value in filter(None, text.split(",")):
+                    option, value = value.split(";")
+                    row[option] = float(value)
+            else:
+                row[data.get("column")] = float(text)
+        rows.append(row)
+    return pd.DataFrame(rows, columns=list(binary) + list(numeric) + [nfp])
+
+
+def read_learning_data(cache_dir: str, nfp) -> pd.DataFrame:
+    """
+    Reads the measurements serialized in cache_dir back into a dataframe.
+    """
+    vm = ET.parse(os.path.join(cache_dir, "vm.xml"))
+    measurements = ET.parse(os.path.join(cache_dir, "measurements.xml"))
+    binary = vm_options(vm, "binaryOptions")
+    numeric = vm_options(vm, "numericOptions")
+    return _splcxml_to_pandas(measurements, nfp, binary, numeric)
+
+
+def append_learning_data(cache_dir: str, new_data: pd.DataFrame(), nfp) -> ET:
+    """
+    Like prepare_learning_data, but only serializes the rows of new_data and
+    appends them to the measurements already serialized in cache_dir. If the
+    options of new_data differ from the serialized ones, all measurements are
+    prepared again.
+    """
+    vm = ET.parse(os.path.join(cache_dir, "vm.xml"))
+    binary = vm_options(vm, "binaryOptions")
+    numeric = vm_options(vm, "numericOptions")
+    features = new_data.drop(nfp, axis=1)
+    if set(features.columns) != set(binary) | set(numeric) or not (
+        features[binary].isin([0, 1]).all().all()
+    ):
+        data = pd.concat(
+            [read_learning_data(cache_dir, nfp), new_data], ignore_index=True
+        )
+        return prepare_learning_data(data, nfp)
+
+    measurements = ET.parse(os.path.join(cache_dir, "measurements.xml"))
+    new_rows = _pandas_to_splcxml(new_data, nfp, binary, numeric)
+    measurements.getroot().extend(new_rows.getroot())
+
+    min_, max_ = min(new_data.min()), max(new_data.max())
+    if numeric:
+        old_range = vm.find("numericOptions").find("configurationOption")
+        min_ = min(min_, float(old_range.find("minValue").text))
+        max_ = max(max_, float(old_range.find("maxValue").text))
+    vm = _features_to_vm(binary, numeric, min_, max_)
+
+    return vm, measurements
+
+
 def serialize_data(cache_dir: str, artifacts: dict):
     if not os.path.exists(cache_dir):
         os.makedirs(cache_dir)
@@ -0,0 +1,136 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from splc2py._logs import CONSTANT_OPTIONS
+
+
+def _term_key(term):
+    return tuple(sorted(term["options"]))
+
+
+def _unsupported_options(model, columns):
+    return sorted(
+        {
+            option
+            for term in model
+            for option in term["options"]
+            if option not in CONSTANT_OPTIONS and option not in columns
+        }
+    )
+
+
+def check_terms(model, columns):
+    """
+    Raises if a term is not a product of the given columns, e.g. because SPLC
+    learned a function of an option.
+    """
+    unsupported = _unsupported_options(model, columns)
+    if unsupported:
+        logging.error("Terms with the options %s can not be refitted.", unsupported)
+        raise ValueError(f"Unsupported options in terms: {unsupported}.")
+
+
+def design_matrix(model, data: pd.DataFrame):
+    """
+    Returns the value of every term (columns) for every measurement (rows).
+    """
+    check_terms(model, data.columns)
+    matrix = np.ones((len(data), len(model)))
+    for i, term in enumerate(model):
+        for option in term["options"]:
+            if option not in CONSTANT_OPTIONS:
+                matrix[:, i] *= data[option].to_numpy(dtype=float)
+    return matrix
+
+
+class NormalEquations:
+    """
+    Accumulated normal equations XᵀX and Xᵀy of the terms of a model.
+    ...
+
+    Updating with new measurements only costs O(rows * terms²), solving
+    costs O(terms³) in LAPACK and XᵀX needs terms² floats of memory, which
+    is fine for models with up to a few thousand terms. Only terms that are
+    products of measured options are supported.
+
+    Methods
+    -------
+    update(model, data, nfp):
+        Adds the contribution of new measurements.
+
+    solve():
+        Returns the least squares coefficients of the terms.
+
+    packed():
+        Returns the equations in the format stored in model files.
+    """
+
+    def __init__(self, xtx, xty, n_samples):
+        self.xtx = xtx
+        self.xty = xty
+        self.n_samples = n_samples
+
+    @classmethod
+    def from_data(cls, model, data: pd.DataFrame, nfp):
+        equations = cls(np.zeros((len(model), len(model))), np.zeros(len(model)), 0)
+        equations.update(model, data, nfp)
+        return equations
+
+    @classmethod
+    def from_packed(cls, xtx, xty, n_samples):
+        n = len(xty)
+        upper = np.triu_indices(n)
+        full = np.zeros((n, n))
+        full[upper] = np.frombuffer(xtx, dtype=float)
+        full.T[upper] = full[upper]
+        return cls(full, np.array(xty, dtype=float), n_samples)
+
+    def update(self, model, data: pd.DataFrame, nfp):
+        matrix = design_matrix(model, data)
+        self.xtx += matrix.T @ matrix
+        self.xty += matrix.T @ data[nfp].to_numpy(dtype=float)
+        self.n_samples += len(data)
+
+    def solve(self):
+        coefficients, _, _, _ = np.linalg.lstsq(self.xtx, self.xty, rcond=None)
+        return coefficients.tolist()
+
+    def packed(self):
+        upper = np.triu_indices(len(self.xty))
+        return self.xtx[upper].tolist(), self.xty.tolist(), self.n_samples
+
+
+def relative_error(model, data: pd.DataFrame, nfp):
+    """
+    Mean relative error of the model in percent, rows with target 0 are ignored.
+    None if the terms of the model can not be evaluated on data.
+    """
+    if _unsupported_options(model, data.columns):
+        return None
+    coefficients = np.array([term["coefficient"] for term in model])
+    predictions = design_matrix(model, data) @ coefficients
+    targets = data[nfp].to_numpy(dtype=float)
+    mask = targets != 0
+    if not mask.any():
+        return 0.0
+    errors = np.abs(predictions[mask] - targets[mask]) / np.abs(targets[mask])
+    return float(100 * errors.mean())
+
+
+def diff_models(old, new):
+    """
+    Compares two models term by term.
+    """
+    old_terms = {_term_key(t): t["coefficient"] for t in old}
+    new_terms = {_term_key(t): t["coefficient"] for t in new}
+    return {
+        "added": [list(k) for k in new_terms if k not in old_terms],
+        "removed": [list(k) for k in old_terms if k not in new_terms],
+        "changed": [
+            {"options": list(k), "old": old_terms[k], "new": new_terms[k]}
+            for k in new_terms
+            if k in old_terms and old_terms[k] != new_terms[k]
+        ],
+    }
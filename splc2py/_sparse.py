@@ -0,0 +1,89 @@
+import logging
+from collections import defaultdict
+
+from splc2py._logs import CONSTANT_OPTIONS
+
+
+class SparseEvaluator:
+    """
+    Evaluates a model only on the terms that are active in a configuration.
+    ...
+
+    Terms are indexed by their binary options. A term is active if all of its
+    binary options are enabled, only then its numeric options are multiplied.
+    Terms without binary options are always active. If the binary options are
+    not known, all options are indexed, which is still correct since a term
+    with a disabled option is zero.
+
+    Methods
+    -------
+    evaluate(config):
+        Predicts a configuration given as a mapping of its non-zero options.
+
+    evaluate_csr(indptr, indices, data, columns):
+        Predicts every row of a matrix in compressed sparse row format.
+    """
+
+    def __init__(self, model, binary=None):
+        self._coefficients = []
+        self._numerics = []
+        self._n_binaries = []
+        self._always = []
+        self._postings = defaultdict(list)
+        binary = set(binary) if binary is not None else None
+        for term_id, term in enumerate(model):
+            options = [o for o in term["options"] if o not in CONSTANT_OPTIONS]
+            if binary is None:
+                binaries = set(options)
+                numerics = options
+            else:
+                binaries = {o for o in options if o in binary}
+                numerics = [o for o in options if o not in binary]
+
+            self._coefficients.append(term["coefficient"])
+            self._numerics.append(numerics)
+            self._n_binaries.append(len(binaries))
+            if not binaries:
+                self._always.append(term_id)
+            for option in binaries:
+                self._postings[option].append(term_id)
+
+    def _active_terms(self, config):
+        hits = defaultdict(int)
+        for option, value in config.items():
+            if value and option in self._postings:
+                for term_id in self._postings[option]:
+                    hits[term_id] += 1
+        active = [t for t, n in hits.items() if n == self._n_binaries[t]]
+        return self._always + active
+
+    def evaluate(self, config):
+        prediction = 0.0
+        for term_id in self._active_terms(config):
+            value = self._coefficients[term_id]
+            for option in self._numerics[term_id]:
+                value *= config.get(option, 0)
+            prediction += value
+        return prediction
+
+    def evaluate_csr(self, indptr, indices, data, columns):
+        predictions = []
+        for row in range(len(indptr) - 1):
+            start, end = indptr[row], indptr[row + 1]
+            config = {columns[indices[k]]: data[k] for k in range(start, end)}
+            predictions.append(self.evaluate(config))
+        return predictions
+
+
+def dataframe_to_csr(X):
+    if X.isna().any().any():
+        logging.error("Sparse predictions do not support missing values.")
+        raise ValueError("Missing values in configurations.")
+    indptr, indices, data = [0], [], []
+    for row in X.itertuples(index=False):
+        for i, value in enumerate(row):
+            if value:
+                indices.append(i)
+                data.append(value)
+        indptr.append(len(indices))
+    return indptr, indices, data
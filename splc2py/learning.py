@@ -5,22 +5,64 @@ import logging
 from functools import reduce
 import operator
 
+from typing import Sequence
+
 import pandas as pd
-from splc2py import _preprocess, _splc, _logs
+from splc2py import _preprocess, _splc, _logs, _persistence, _codegen, _sparse, _refit
 
 
 class Model:
     def __init__(self, backend):
         self.fitted = False
+        self.compact = None
         self.model = None
         self.learn_history = None
         self.learning_time = None
         self.configs_large_dev = None
         self.artifact_repo = None
+        self.binary = None
+        self.nfp = None
+        self.normal_equations = None
+        self._sparse = None
         self.splc = _splc.SplcExecutorFactor(backend)
 
+    # A loaded model keeps its terms and history in the mapped file and only
+    # decodes them into python objects when they are accessed.
+    @property
+    def model(self):
+        if self._model is None and self.compact is not None:
+            self._model = self.compact.terms()
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    @property
+    def learn_history(self):
+        if self._learn_history is None and self.compact is not None:
+            self._learn_history = self.compact.history_rows()
+        return self._learn_history
+
+    @learn_history.setter
+    def learn_history(self, learn_history):
+        self._learn_history = learn_history
+
+    @property
+    def configs_large_dev(self):
+        if self._configs_large_dev is None and self.compact is not None:
+            self._configs_large_dev = self.compact.configs_large_dev
+        return self._configs_large_dev
+
+    @configs_large_dev.setter
+    def configs_large_dev(self, configs_large_dev):
+        self._configs_large_dev = configs_large_dev
+
     def fit(self, measurements, nfp, mlsettings={}):
+        self.nfp = nfp
+        self.normal_equations = None
         vm, measurements = _preprocess.prepare_learning_data(measurements, nfp)
+        self.binary = _preprocess.vm_options(vm, "binaryOptions")
         self.artifact_repo = os.path.join(tempfile.gettempdir(), uuid.uuid4().hex)
         os.mkdir(self.artifact_repo)
 
@@ -37,15 +79,128 @@ class Model:
         }
 
         _preprocess.serialize_data(self.artifact_repo, params)
+        self._learn()
+
+    def _learn(self):
         self.splc.execute(self.artifact_repo)
+        self.compact = None
         (
             self.model,
             self.learn_history,
             self.learning_time,
             self.configs_large_dev,
         ) = _logs.extract_model(self.artifact_repo)
+        self._sparse = None
         self.fitted = True
 
+    def _append_measurements(self, new_data):
+        if self.artifact_repo is None or not os.path.exists(self.artifact_repo):
+            logging.error("Refitting needs the artifacts of the previous fit.")
+            raise Exception
+
+        vm, measurements = _preprocess.append_learning_data(
+            self.artifact_repo, new_data, self.nfp
+        )
+        self.binary = _preprocess.vm_options(vm, "binaryOptions")
+        _preprocess.serialize_data(
+            self.artifact_repo, {"vm.xml": vm, "measurements.xml": measurements}
+        )
+
+    def _reselect(self, new_data):
+        self._append_measurements(new_data)
+        logs = os.path.join(self.artifact_repo, "logs.txt")
+        if os.path.exists(logs):
+            os.remove(logs)
+        self._learn()
+        self.normal_equations = None
+
+    def _normal_equations_from_artifact(self):
+        data = _preprocess.read_learning_data(self.artifact_repo, self.nfp)
+        return _refit.NormalEquations.from_data(self.model, data, self.nfp)
+
+    def _update_coefficients(self, new_data):
+        _refit.check_terms(self.model, new_data.columns)
+        equations = self.normal_equations
+        if equations is None and self.compact is not None:
+            if self.compact.normal_equations is not None:
+                equations = _refit.NormalEquations.from_packed(
+                    *self.compact.normal_equations
+                )
+
+        self._append_measurements(new_data)
+        if equations is None:
+            equations = self._normal_equations_from_artifact()
+        else:
+            equations.update(self.model, new_data, self.nfp)
+
+        terms = self.model
+        self.compact = None
+        self.normal_equations = equations
+        self.model = [
+            {"coefficient": coefficient, "options": term["options"]}
+            for coefficient, term in zip(equations.solve(), terms)
+        ]
+        # the SPLC learning results do not describe the refitted model
+        self.learn_history = None
+        self.learning_time = None
+        self.configs_large_dev = None
+
+    def refit(self, measurements, reselect: bool = False):
+        if not self.fitted:
+            logging.error("No model fitted yet.")
+            raise Exception
+
+        previous = self.model
+        if reselect:
+            self._reselect(measurements)
+        else:
+            self._update_coefficients(measurements)
+        self._sparse = None
+
+        report = _refit.diff_models(previous, self.model)
+        report["error"] = {
+            "old": _refit.relative_error(previous, measurements, self.nfp),
+            "new": _refit.relative_error(self.model, measurements, self.nfp),
+        }
+        return report
+
+    def save(self, path: str, include_refit_state: bool = False):
+        if not self.fitted:
+            logging.error("No model fitted yet.")
+            raise Exception
+        normal_equations = None
+        if include_refit_state:
+            if self.normal_equations is not None:
+                normal_equations = self.normal_equations.packed()
+            elif self.compact is not None and self.compact.normal_equations:
+                normal_equations = self.compact.normal_equations
+            else:
+                self.normal_equations = self._normal_equations_from_artifact()
+                normal_equations = self.normal_equations.packed()
+        _persistence.dump(
+            path,
+            self.model,
+            self.learn_history,
+            self.learning_time,
+            self.configs_large_dev,
+            self.binary,
+            self.nfp,
+            self.artifact_repo,
+            normal_equations,
+        )
+
+    @classmethod
+    def load(cls, path: str, backend: str = "local", use_mmap: bool = True):
+        compact = _persistence.load(path, use_mmap)
+        model = cls(backend)
+        model.compact = compact
+        model.learning_time = compact.learning_time
+        model.binary = compact.binary
+        model.nfp = compact.nfp
+        model.artifact_repo = compact.artifact_repo
+        model.fitted = True
+        return model
+
     def to_string(self):
         if not self.fitted:
             logging.error("No model fitted yet.")
@@ -58,7 +213,27 @@ class Model:
                 ]
             )
 
+    def to_python(self, function_name: str = "predict"):
+        if not self.fitted:
+            logging.error("No model fitted yet.")
+            raise Exception
+        return _codegen.generate_python(self.model, function_name)
+
+    def to_c(self, function_name: str = "predict"):
+        if not self.fitted:
+            logging.error("No model fitted yet.")
+            raise Exception
+        return _codegen.generate_c(self.model, function_name)
+
+    def compile_predictor(self):
+        if not self.fitted:
+            logging.error("No model fitted yet.")
+            raise Exception
+        return _codegen.compile_python(self.model)
+
     def _calculate_prediction(self, x):
+        if self._model is None:
+            return self.compact.evaluate(x)
         interim = []
         for term in self.model:
             options = reduce(operator.mul, [x[option] for option in term["options"]], 1)
@@ -78,3 +253,22 @@ class Model:
                 return result[0]
             else:
                 return result
+
+    def predict_sparse(self, X, columns: Sequence[str] = None):
+        if not self.fitted:
+            logging.error("No model fitted yet.")
+            raise Exception
+        if self._sparse is None:
+            self._sparse = _sparse.SparseEvaluator(self.model, self.binary)
+
+        if isinstance(X, pd.DataFrame):
+            return self._sparse.evaluate_csr(*_sparse.dataframe_to_csr(X), X.columns)
+        if hasattr(X, "indptr"):
+            if getattr(X, "format", "csr") != "csr":
+                logging.error("Sparse matrices have to be in CSR format.")
+                raise ValueError(f"Unsupported sparse format {X.format}.")
+            if columns is None:
+                logging.error("Column names are needed for sparse matrices.")
+                raise Exception
+            return self._sparse.evaluate_csr(X.indptr, X.indices, X.data, columns)
+        return [self._sparse.evaluate(config) for config in X]
@@ -1,5 +1,277 @@
+import os
+import mmap
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
 from splc2py import __version__
+from splc2py import _codegen, _persistence, _preprocess, _refit, _sparse
+from splc2py.learning import Model
 
 
 def test_version():
-    assert __version__ == '0.1.0'
+    assert __version__ == "0.1.0"
+
+
+def test_persistence_roundtrip(tmp_path):
+    model = [
+        {"coefficient": 1.5, "options": ["root"]},
+        {"coefficient": -2.0, "options": ["a", "b"]},
+    ]
+    history = [{"Round": "1", "ValidationError": "0.1"}]
+    path = str(tmp_path / "model.splc")
+    _persistence.dump(path, model, history, 12.5, "0")
+
+    compact = _persistence.load(path)
+    assert compact.terms() == model
+    assert compact.history_rows() == history
+    assert compact.learning_time == 12.5
+
+
+def _fitted_model():
+    model = Model("local")
+    model.model = [
+        {"coefficient": 1.5, "options": ["root"]},
+        {"coefficient": -2.0, "options": ["a", "b"]},
+        {"coefficient": 0.5, "options": ["a", "b", "n"]},
+        {"coefficient": 2.0, "options": ["n"]},
+    ]
+    model.learn_history = [{"Round": "1", "ValidationError": "0.1"}]
+    model.configs_large_dev = "0"
+    model.binary = ["a", "b"]
+    model.fitted = True
+    return model
+
+
+def test_model_save_load_predicts_from_mapped_file(tmp_path):
+    model = _fitted_model()
+    path = str(tmp_path / "model.splc")
+    model.save(path)
+    loaded = Model.load(path)
+
+    X = pd.DataFrame({"a": [1, 0, 1], "b": [1, 1, 0], "n": [3.0, 2.0, 0.5]})
+    assert list(loaded.predict(X)) == list(model.predict(X))
+    assert isinstance(loaded.compact._buffer, mmap.mmap)
+    assert loaded._model is None
+    assert loaded.learning_time is None
+    assert loaded.model == model.model
+    assert loaded.learn_history == model.learn_history
+
+
+def test_model_without_history_roundtrips(tmp_path):
+    model = _fitted_model()
+    model.learn_history = None
+    model.configs_large_dev = None
+    path = str(tmp_path / "model.splc")
+    model.save(path)
+
+    loaded = Model.load(path)
+    assert loaded.learn_history is None
+    assert loaded.configs_large_dev is None
+    assert loaded.learning_time is None
+
+
+def test_save_does_not_break_mapped_readers(tmp_path):
+    model = _fitted_model()
+    path = str(tmp_path / "model.splc")
+    model.save(path)
+    loaded = Model.load(path)
+
+    other = _fitted_model()
+    other.model = [{"coefficient": 4.0, "options": ["root"]}]
+    other.save(path)
+
+    X = pd.DataFrame({"a": [1], "b": [1], "n": [3.0]})
+    assert loaded.predict(X) == model.predict(X)
+    assert Model.load(path).predict(X) == 4.0
+    assert os.listdir(tmp_path) == ["model.splc"]
+
+
+def test_generated_predictor_matches_terms():
+    model = [
+        {"coefficient": 1.5, "options": ["root"]},
+        {"coefficient": -2.0, "options": ["a", "b"]},
+        {"coefficient": 0.5, "options": ["a", "b", "n"]},
+        {"coefficient": 2.0, "options": ["n"]},
+    ]
+    predict = _codegen.compile_python(model)
+    assert predict({"a": 1, "b": 1, "n": 3.0}) == 1.5 - 2.0 + 1.5 + 6.0
+    assert predict({"a": 0, "b": 1, "n": 3.0}) == 1.5 + 6.0
+
+
+def test_generated_predictor_rejects_invalid_input():
+    model = [{"coefficient": 1.0, "options": ["a"]}]
+    with pytest.raises(ValueError):
+        _codegen.generate_python(model, "predict(x): pass\ndef f")
+    with pytest.raises(ValueError):
+        _codegen.generate_c([{"coefficient": float("inf"), "options": ["a"]}])
+    with pytest.raises(ValueError):
+        _codegen.generate_c([{"coefficient": 1.0, "options": ["a*/ int x; /*"]}])
+    assert "x[0]" in _codegen.generate_c(model)
+
+
+def test_sparse_evaluator_skips_disabled_terms():
+    model = [
+        {"coefficient": 1.5, "options": ["root"]},
+        {"coefficient": -2.0, "options": ["a", "b"]},
+        {"coefficient": 0.5, "options": ["a", "n"]},
+        {"coefficient": 2.0, "options": ["n"]},
+    ]
+    for binary in (["a", "b"], None):
+        evaluator = _sparse.SparseEvaluator(model, binary)
+        assert evaluator.evaluate({"a": 1, "b": 1, "n": 3.0}) == 1.5 - 2.0 + 1.5 + 6.0
+        assert evaluator.evaluate({"b": 1, "n": 3.0}) == 1.5 + 6.0
+        csr = ([0, 2, 3], [0, 2, 1], [1, 2.0, 1], ["a", "b", "n"])
+        assert evaluator.evaluate_csr(*csr) == [1.5 + 1.0 + 4.0, 1.5]
+
+
+def _measurements(a, n):
+    data = pd.DataFrame({"a": a, "n": n})
+    data["nfp"] = 2.0 + 3.0 * data["a"] * data["n"]
+    return data
+
+
+class _FakeSplc:
+    """
+    Writes the logs SPLC would write for the given model.
+    """
+
+    def __init__(self, model="1.0 * root + 1.0 * a * n"):
+        self.model = model
+        self.executions = []
+
+    def execute(self, mount_path):
+        self.executions.append(mount_path)
+        with open(os.path.join(mount_path, "logs.txt"), "w", encoding="utf-8") as f:
+            f.write(
+                "command: analyze-learning\n"
+                "Round,Model,ValidationError\n"
+                "\n"
+                "\n"
+                f"1;{self.model};10.0\n"
+                "Analyze finished\n"
+                "Elapsed=00:00:01.5\n"
+                "Configurations with large deviation: 0\n"
+            )
+        return mount_path
+
+
+def _fake_fit(data, splc_model="1.0 * root + 1.0 * a * n"):
+    model = Model("local")
+    model.splc = _FakeSplc(splc_model)
+    model.fit(data, "nfp")
+    return model
+
+
+def test_normal_equations_are_incremental():
+    model = [
+        {"coefficient": 1.0, "options": ["root"]},
+        {"coefficient": 1.0, "options": ["a", "n"]},
+    ]
+    old = _measurements([0, 1, 1], [1.0, 2.0, 3.0])
+    new = _measurements([0, 1], [4.0, 5.0])
+
+    equations = _refit.NormalEquations.from_data(model, old, "nfp")
+    equations.update(model, new, "nfp")
+    full = _refit.NormalEquations.from_data(
+        model, pd.concat([old, new], ignore_index=True), "nfp"
+    )
+    assert equations.n_samples == 5
+    assert (equations.xtx == full.xtx).all() and (equations.xty == full.xty).all()
+
+    coefficients = equations.solve()
+    assert abs(coefficients[0] - 2.0) < 1e-9 and abs(coefficients[1] - 3.0) < 1e-9
+
+
+def test_refit_after_loading_saved_model(tmp_path):
+    model = _fake_fit(_measurements([0, 1, 1, 0], [1.0, 2.0, 3.0, 4.0]))
+    path = str(tmp_path / "model.splc")
+    model.save(path)
+
+    loaded = Model.load(path)
+    report = loaded.refit(_measurements([1, 0], [5.0, 6.0]))
+    coefficients = [term["coefficient"] for term in loaded.model]
+    assert abs(coefficients[0] - 2.0) < 1e-9 and abs(coefficients[1] - 3.0) < 1e-9
+    assert len(report["changed"]) == 2 and not report["added"]
+    assert report["error"]["new"] < report["error"]["old"]
+    assert loaded.learn_history is None and loaded.learning_time is None
+
+    loaded.save(path)
+    reloaded = Model.load(path)
+    assert reloaded.model == loaded.model
+    assert reloaded.compact.normal_equations is None
+    size = os.path.getsize(path)
+
+    loaded.save(path, include_refit_state=True)
+    assert os.path.getsize(path) > size
+    reloaded = Model.load(path)
+    assert reloaded.compact.normal_equations[2] == 6
+    reloaded.refit(_measurements([1], [7.0]))
+    assert reloaded.normal_equations.n_samples == 7
+
+
+def test_local_refit_measurements_survive_reselect():
+    model = _fake_fit(_measurements([0, 1, 1, 0], [1.0, 2.0, 3.0, 4.0]))
+    model.refit(_measurements([1, 0], [5.0, 6.0]))
+    assert model.normal_equations.n_samples == 6
+
+    model.refit(_measurements([1], [7.0]), reselect=True)
+    data = _preprocess.read_learning_data(model.artifact_repo, "nfp")
+    assert list(data["n"]) == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+
+    model.refit(_measurements([0], [8.0]))
+    assert model.normal_equations.n_samples == 8
+
+
+def test_refit_rejects_function_terms():
+    model = _fake_fit(
+        _measurements([0, 1, 1], [1.0, 2.0, 3.0]), "1.0 * root + 1.0 * log10(n)"
+    )
+    with pytest.raises(ValueError):
+        model.refit(_measurements([1], [4.0]))
+    data = _preprocess.read_learning_data(model.artifact_repo, "nfp")
+    assert len(data) == 3
+
+
+def test_refit_reselect_appends_measurements(tmp_path):
+    model = _fake_fit(_measurements([0, 1, 1], [1.0, 2.0, 3.0]))
+    path = str(tmp_path / "model.splc")
+    model.save(path)
+
+    loaded = Model.load(path)
+    loaded.splc = _FakeSplc()
+    loaded.refit(_measurements([1, 0], [7.0, 8.0]), reselect=True)
+    assert loaded.splc.executions == [model.artifact_repo]
+    data = _preprocess.read_learning_data(model.artifact_repo, "nfp")
+    assert list(data["n"]) == [1.0, 2.0, 3.0, 7.0, 8.0]
+
+    new_option = _measurements([1], [9.0])
+    new_option["m"] = 5.0
+    vm, measurements = _preprocess.append_learning_data(
+        model.artifact_repo, new_option, "nfp"
+    )
+    assert _preprocess.vm_options(vm, "numericOptions") == ["n", "m"]
+    assert len(measurements.getroot().findall("row")) == 6
+
+
+def test_predict_sparse_matches_predict(tmp_path):
+    model = _fitted_model()
+    path = str(tmp_path / "model.splc")
+    model.save(path)
+    loaded = Model.load(path)
+
+    X = pd.DataFrame({"a": [1, 0, 1], "b": [1, 1, 0], "n": [3.0, 2.0, 0.0]})
+    expected = list(model.predict(X))
+    csr = SimpleNamespace(indptr=[0, 3, 5, 6], indices=[0, 1, 2, 1, 2, 0])
+    csr.data = [1, 1, 3.0, 1, 2.0, 1]
+    for m in (model, loaded):
+        assert m.predict_sparse(X) == expected
+        assert m.predict_sparse(csr, columns=["a", "b", "n"]) == expected
+        assert m.predict_sparse(X.to_dict("records")) == expected
+
+    with pytest.raises(ValueError):
+        model.predict_sparse(pd.DataFrame({"a": [1], "b": [None], "n": [1.0]}))
+    csc = SimpleNamespace(indptr=[0], indices=[], data=[], format="csc")
+    with pytest.raises(ValueError):
+        model.predict_sparse(csc, columns=["a", "b", "n"])